@@ -3,10 +3,18 @@ agent.py — Skylark Drone Ops Agent using Groq (free, fast, no credit card).
 Model: llama-3.3-70b-versatile — supports tool/function calling.
 """
 
+import asyncio
+import hashlib
 import json
 import os
+import time
 import streamlit as st
 from groq import Groq
+
+try:
+    from orjson import loads as _jloads  # ~2-3x faster than stdlib on small payloads
+except ImportError:
+    from json import loads as _jloads
 from tools import (
     query_pilots, calculate_pilot_cost, get_pilot_assignments, update_pilot_status,
     match_pilots_to_mission, match_drones_to_mission, assign_pilot_to_mission,
@@ -33,7 +41,7 @@ TOOL_FUNCTIONS = {
 }
 
 TOOLS = [
-    {"type":"function","function":{"name":"query_pilots","description":"Search pilot roster by skill, certification, location, or status.","parameters":{"type":"object","properties":{"skill":{"type":"string"},"certification":{"type":"string"},"location":{"type":"string"},"status":{"type":"string"}}}}},
+    {"type":"function","function":{"name":"query_pilots","description":"Search pilot roster by skill, certification, location, or status.","parameters":{"type":"object","properties":{"skill":{"type":"string"},"certification":{"type":"string"},"location":{"type":"string"},"status":{"type":"string"},"limit":{"type":"integer","description":"Max rows to return; count still reflects all matches"}}}}},
     {"type":"function","function":{"name":"calculate_pilot_cost","description":"Calculate total cost of a pilot for a mission and check against budget.","parameters":{"type":"object","properties":{"pilot_id":{"type":"string"},"mission_id":{"type":"string"}},"required":["pilot_id","mission_id"]}}},
     {"type":"function","function":{"name":"get_pilot_assignments","description":"View all currently assigned pilots and their missions.","parameters":{"type":"object","properties":{}}}},
     {"type":"function","function":{"name":"update_pilot_status","description":"Update pilot status and sync to Google Sheets.","parameters":{"type":"object","properties":{"pilot_id":{"type":"string"},"new_status":{"type":"string"},"assignment":{"type":"string"}},"required":["pilot_id","new_status"]}}},
@@ -41,8 +49,8 @@ TOOLS = [
     {"type":"function","function":{"name":"match_drones_to_mission","description":"Find drones for a mission. Flags maintenance, weather incompatibility, location mismatch.","parameters":{"type":"object","properties":{"mission_id":{"type":"string"}},"required":["mission_id"]}}},
     {"type":"function","function":{"name":"assign_pilot_to_mission","description":"Assign a pilot to a mission with conflict pre-check. Syncs to Google Sheets.","parameters":{"type":"object","properties":{"pilot_id":{"type":"string"},"mission_id":{"type":"string"}},"required":["pilot_id","mission_id"]}}},
     {"type":"function","function":{"name":"assign_drone_to_mission","description":"Assign a drone to a mission with conflict pre-check. Syncs to Google Sheets.","parameters":{"type":"object","properties":{"drone_id":{"type":"string"},"mission_id":{"type":"string"}},"required":["drone_id","mission_id"]}}},
-    {"type":"function","function":{"name":"get_active_assignments","description":"Get all missions with assigned pilots or drones.","parameters":{"type":"object","properties":{}}}},
-    {"type":"function","function":{"name":"query_drones","description":"Search drone fleet by capability, status, location, or weather resistance.","parameters":{"type":"object","properties":{"capability":{"type":"string"},"status":{"type":"string"},"location":{"type":"string"},"weather_resistance":{"type":"string"}}}}},
+    {"type":"function","function":{"name":"get_active_assignments","description":"Get all missions with assigned pilots or drones.","parameters":{"type":"object","properties":{"limit":{"type":"integer","description":"Max rows to return; count still reflects all matches"}}}}},
+    {"type":"function","function":{"name":"query_drones","description":"Search drone fleet by capability, status, location, or weather resistance.","parameters":{"type":"object","properties":{"capability":{"type":"string"},"status":{"type":"string"},"location":{"type":"string"},"weather_resistance":{"type":"string"},"limit":{"type":"integer","description":"Max rows to return; count still reflects all matches"}}}}},
     {"type":"function","function":{"name":"flag_maintenance_issues","description":"Flag drones with overdue or upcoming maintenance within 30 days.","parameters":{"type":"object","properties":{}}}},
     {"type":"function","function":{"name":"update_drone_status","description":"Update drone status and sync to Google Sheets.","parameters":{"type":"object","properties":{"drone_id":{"type":"string"},"new_status":{"type":"string"},"location":{"type":"string"}},"required":["drone_id","new_status"]}}},
     {"type":"function","function":{"name":"detect_all_conflicts","description":"Full conflict scan: double-booking, cert mismatch, budget overrun, maintenance, weather risk, location mismatch.","parameters":{"type":"object","properties":{}}}},
@@ -71,6 +79,14 @@ EDGE CASES TO DETECT:
 
 Be concise, use bullet points, flag issues with emojis. Use INR for currency."""
 
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+_MODEL = "llama-3.3-70b-versatile"
+
+# Static request parameters built once at import — every create() call shares
+# the same TOOLS object instead of assembling per-call keyword dicts
+_TOOL_CALL_KWARGS = {"model": _MODEL, "tools": TOOLS, "tool_choice": "auto"}
+
 
 def _get_api_key():
     try:
@@ -81,40 +97,197 @@ def _get_api_key():
     return os.environ.get("GROQ_API_KEY", "")
 
 
-def run_tool(name: str, args: dict) -> str:
+@st.cache_resource
+def _get_client(api_key: str) -> Groq:
+    # The Groq client wraps an HTTPS connection pool — build once per process
+    # so keep-alive connections survive across turns
+    return Groq(api_key=api_key)
+
+
+# Read-only tools can be served from cache for a short TTL (seconds) —
+# identical invocations skip both the tool body and the Sheets round-trip.
+_READ_TTLS = {
+    "query_pilots": 30,
+    "query_drones": 30,
+    "get_pilot_assignments": 30,
+    "get_active_assignments": 30,
+    "match_pilots_to_mission": 30,
+    "match_drones_to_mission": 30,
+    "detect_all_conflicts": 15,
+    "check_mission_conflicts": 15,
+    "flag_maintenance_issues": 60,
+    "calculate_pilot_cost": 120,
+}
+# Mutating tools always execute, then drop the cache so reads see fresh data
+_WRITE_TOOLS = {
+    "update_pilot_status", "update_drone_status",
+    "assign_pilot_to_mission", "assign_drone_to_mission",
+}
+_TOOL_CACHE: dict[str, tuple[float, str]] = {}
+
+
+async def run_tool(name: str, args: dict) -> str:
     if name not in TOOL_FUNCTIONS:
         return json.dumps({"error": f"Unknown tool: {name}"})
+
+    ttl = _READ_TTLS.get(name)
+    cache_key = f"{name}:{json.dumps(args, sort_keys=True)}"
+    if ttl:
+        hit = _TOOL_CACHE.get(cache_key)
+        if hit and time.monotonic() - hit[0] < ttl:
+            return hit[1]
+
     try:
-        result = TOOL_FUNCTIONS[name](**args)
-        return json.dumps(result, default=str)
+        # Sheets I/O is blocking — offload to a thread so parallel calls overlap
+        result = await asyncio.to_thread(TOOL_FUNCTIONS[name], **args)
+        out = json.dumps(result, default=str)
     except Exception as e:
         return json.dumps({"error": str(e)})
 
+    if name in _WRITE_TOOLS:
+        _TOOL_CACHE.clear()
+    elif ttl:
+        _TOOL_CACHE[cache_key] = (time.monotonic(), out)
+    return out
+
+
+async def _run_tools_concurrently(calls: list) -> list:
+    """Run all (name, args) tool calls at once; latency = slowest call, not the sum."""
+    return await asyncio.gather(*(run_tool(name, args) for name, args in calls))
+
+
+def _fmt_maintenance(data: dict) -> str:
+    lines = ["🛠️ **Maintenance Report**"]
+    for d in data.get("overdue", []):
+        lines.append(f"- 🔴 {d['drone_id']} ({d['model']}) — OVERDUE by {abs(d['days_until_due'])} days (was due {d['maintenance_due']})")
+    for d in data.get("upcoming_within_30_days", []):
+        lines.append(f"- 🟡 {d['drone_id']} ({d['model']}) — due in {d['days_until_due']} days ({d['maintenance_due']})")
+    if len(lines) == 1:
+        lines.append("- ✅ No maintenance due within 30 days")
+    return "\n".join(lines)
+
+
+def _fmt_active_assignments(data: dict) -> str:
+    missions = data.get("missions", [])
+    if not missions:
+        return "📋 No missions currently have assigned pilots or drones."
+    lines = [f"📋 **Active Assignments** ({data.get('count', len(missions))})"]
+    for m in missions:
+        pilot = m.get("assigned_pilot") or "—"
+        drone = m.get("assigned_drone") or "—"
+        lines.append(f"- {m.get('project_id')} — {m.get('client', '?')} @ {m.get('location', '?')}: pilot {pilot}, drone {drone}")
+    return "\n".join(lines)
 
-def chat(history: list, user_message: str) -> tuple[str, list]:
+
+def _fmt_conflicts(data: dict) -> str:
+    conflicts = data.get("conflicts", [])
+    if not conflicts:
+        return "✅ No conflicts detected across all missions!"
+    icons = {"Critical": "🔴", "High": "🟠", "Medium": "🟡"}
+    lines = [f"⚠️ **{data.get('total_conflicts', len(conflicts))} conflict(s)** — "
+             f"{data.get('critical', 0)} critical / {data.get('high', 0)} high / {data.get('medium', 0)} medium"]
+    for c in conflicts:
+        lines.append(f"- {icons.get(c['severity'], '⚪')} [{c['severity']}] {c['type'].replace('_', ' ')} ({c.get('mission', '')}): {c['detail']}")
+    return "\n".join(lines)
+
+
+# Deterministic tools whose JSON already contains the full answer —
+# for single-call turns we format in Python and skip the second LLM pass
+_DIRECT_RENDERABLE = {
+    "flag_maintenance_issues": _fmt_maintenance,
+    "get_active_assignments": _fmt_active_assignments,
+    "detect_all_conflicts": _fmt_conflicts,
+}
+
+
+# Whole-turn response cache: the canned quick-action prompts arrive verbatim,
+# so an identical prompt in an identical conversation can replay the previous
+# answer without touching Groq at all. Keys hash the full history content —
+# never just its length — so two sessions only share an entry when their
+# conversations are byte-identical, and hits splice the cached turn onto the
+# caller's own history rather than returning a stored one. Turns that ran a
+# write tool are never cached.
+_RESP_TTL = 60  # seconds
+_RESP_CACHE: dict = {}
+
+
+def _resp_cache_key(history: list, user_message: str) -> str:
+    payload = json.dumps(history, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode() + b"\x00" + user_message.encode()).hexdigest()
+
+
+def _stream_final(client, history: list, max_tokens: int, on_delta) -> tuple[str, bool]:
+    """Stream the text-only follow-up completion. No tools= here — the schema
+    would be tokenized (and billed) every turn even though tool calls are not
+    wanted, and omitting it means the model can only respond with text.
+    Returns (text, truncated) so callers can retry with a larger budget."""
+    stream = client.chat.completions.create(
+        model=_MODEL,
+        messages=[_SYSTEM_MSG, *history],
+        max_tokens=max_tokens,
+        stream=True
+    )
+    text = ""
+    truncated = False
+    for chunk in stream:
+        choice = chunk.choices[0]
+        delta = choice.delta.content or ""
+        if delta:
+            text += delta
+            if on_delta:
+                on_delta(text)
+        if choice.finish_reason == "length":
+            truncated = True
+    return text, truncated
+
+
+def chat(history: list, user_message: str, on_delta=None) -> tuple[str, list]:
+    """Run one agent turn. If on_delta is given, it is called with the
+    accumulated answer text as each streamed chunk arrives."""
     api_key = _get_api_key()
     if not api_key:
         return ("⚠️ Groq API key not set.\n\n"
                 "Run in PowerShell: $env:GROQ_API_KEY = 'your_key_here'\n"
                 "Get a FREE key at: https://console.groq.com"), history
 
-    client = Groq(api_key=api_key)
-    history = history + [{"role": "user", "content": user_message}]
+    resp_key = _resp_cache_key(history, user_message)
+    hit = _RESP_CACHE.get(resp_key)
+    if hit and time.monotonic() - hit[0] < _RESP_TTL:
+        _, text, cached_turn = hit
+        if on_delta:
+            on_delta(text)
+        return text, [*history, *cached_turn]
+
+    client = _get_client(api_key)
+    # Copy once, then append in place — repeated `history + [...]` re-copies
+    # every prior message on each step of the turn
+    history = list(history)
+    base_len = len(history)  # messages beyond this are the turn's own delta
+    history.append({"role": "user", "content": user_message})
 
-    # Step 1: Let model decide which tool to call
+    # Step 1: Let model decide which tool to call. A tool_calls block is tiny,
+    # so a tight cap lets the decoder halt early; anything that hits the cap —
+    # a direct text answer or a multi-tool turn cut off mid-arguments — gets
+    # retried with the full budget rather than parsed as-is.
     response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "system", "content": SYSTEM_PROMPT}] + history,
-        tools=TOOLS,
-        tool_choice="auto",
-        max_tokens=4096
+        messages=[_SYSTEM_MSG, *history],
+        max_tokens=256,
+        **_TOOL_CALL_KWARGS
     )
 
     msg = response.choices[0].message
+    if response.choices[0].finish_reason == "length":
+        response = client.chat.completions.create(
+            messages=[_SYSTEM_MSG, *history],
+            max_tokens=4096,
+            **_TOOL_CALL_KWARGS
+        )
+        msg = response.choices[0].message
 
     # If no tool call needed, return answer directly
     if not msg.tool_calls:
-        history = history + [{"role": "assistant", "content": msg.content or ""}]
+        history.append({"role": "assistant", "content": msg.content or ""})
+        _RESP_CACHE[resp_key] = (time.monotonic(), msg.content or "Done.", history[base_len:])
         return msg.content or "Done.", history
 
     # Step 2: Execute all tool calls
@@ -127,25 +300,50 @@ def chat(history: list, user_message: str) -> tuple[str, list]:
             for tc in msg.tool_calls
         ]
     }
-    history = history + [assistant_msg]
+    history.append(assistant_msg)
 
-    for tc in msg.tool_calls:
+    # Parse arguments once per call: empty payloads skip the JSON parser, and
+    # malformed JSON becomes a structured error result the model can react to
+    # instead of silently running the tool with no arguments
+    calls = []   # (name, args), or None where arguments failed to parse
+    arg_errors = {}
+    for idx, tc in enumerate(msg.tool_calls):
+        raw = tc.function.arguments
+        if not raw or raw.strip() in ("", "{}"):
+            calls.append((tc.function.name, {}))
+            continue
         try:
-            args = json.loads(tc.function.arguments)
-        except:
-            args = {}
-        result = run_tool(tc.function.name, args)
-        history = history + [{"role": "tool", "tool_call_id": tc.id, "content": result}]
-
-    # Step 3: Get final answer with tool_choice="none" so it MUST respond with text
-    final = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "system", "content": SYSTEM_PROMPT}] + history,
-        tools=TOOLS,
-        tool_choice="none",
-        max_tokens=4096
-    )
+            calls.append((tc.function.name, _jloads(raw)))
+        except Exception as e:
+            calls.append(None)
+            arg_errors[idx] = json.dumps({"error": "invalid_arguments", "detail": str(e)})
+
+    # Execute all parseable tools concurrently, then zip results back in order
+    valid_results = iter(asyncio.run(_run_tools_concurrently([c for c in calls if c])))
+    results = [arg_errors[i] if c is None else next(valid_results) for i, c in enumerate(calls)]
+    history.extend({"role": "tool", "tool_call_id": tc.id, "content": result}
+                   for tc, result in zip(msg.tool_calls, results))
+
+    # Fast path: a single deterministic tool with no narrative from the model —
+    # render its JSON directly and save one 70B forward pass
+    if len(msg.tool_calls) == 1 and msg.tool_calls[0].function.name in _DIRECT_RENDERABLE and not msg.content:
+        parsed = json.loads(results[0])
+        if "error" not in parsed:
+            text = _DIRECT_RENDERABLE[msg.tool_calls[0].function.name](parsed)
+            if on_delta:
+                on_delta(text)
+            history.append({"role": "assistant", "content": text})
+            _RESP_CACHE[resp_key] = (time.monotonic(), text, history[base_len:])
+            return text, history
+
+    # Step 3: Get the final text answer. Most answers fit well under 1024
+    # tokens; if one is cut off, rerun with the full budget.
+    final_text, truncated = _stream_final(client, history, 1024, on_delta)
+    if truncated:
+        final_text, _ = _stream_final(client, history, 4096, on_delta)
 
-    final_text = final.choices[0].message.content or "Done."
-    history = history + [{"role": "assistant", "content": final_text}]
+    final_text = final_text or "Done."
+    history.append({"role": "assistant", "content": final_text})
+    if not any(c and c[0] in _WRITE_TOOLS for c in calls):
+        _RESP_CACHE[resp_key] = (time.monotonic(), final_text, history[base_len:])
     return final_text, history
\ No newline at end of file
@@ -7,7 +7,7 @@ import streamlit as st
 import pandas as pd
 from agent import chat
 from tools import detect_all_conflicts, flag_maintenance_issues
-from sheets import read_sheet
+from sheets import read_sheets_batch
 
 # ─────────────────────────────────────────────
 # PAGE CONFIG
@@ -83,10 +83,21 @@ html, body, [class*="css"] { font-family: 'Syne', sans-serif; }
 }
 .chip-available { background: #063020; color: #2dd4a0; }
 .chip-assigned { background: #0d1f3f; color: #60a5fa; }
-.chip-leave { background: #2a2005; color: #f5c242; }
+.chip-leave, .chip-on-leave { background: #2a2005; color: #f5c242; }
 .chip-unavailable { background: #200808; color: #f46060; }
 .chip-maintenance { background: #200808; color: #f46060; }
 .chip-deployed { background: #0d1f3f; color: #60a5fa; }
+.chip-urgent { background: #1f0808; color: #f46060; }
+.chip-high { background: #1f1008; color: #f97316; }
+.chip-standard { background: #0d1f3f; color: #60a5fa; }
+
+.stMarkdown table { width: 100%; border-collapse: collapse; font-size: 0.8rem; }
+.stMarkdown th {
+    color: #3a5070; text-transform: uppercase; letter-spacing: 1px;
+    font-size: 0.65rem; text-align: left; padding: 6px 10px;
+    border-bottom: 1px solid #1a3560;
+}
+.stMarkdown td { border-bottom: 1px solid #162035; padding: 6px 10px; color: #8aaac8; }
 
 .section-label {
     font-size: 0.62rem; text-transform: uppercase; letter-spacing: 3px;
@@ -113,9 +124,47 @@ hr { border-color: #162035 !important; }
 </style>
 """, unsafe_allow_html=True)
 
+# ─────────────────────────────────────────────
+# TABLE RENDERING
+# ─────────────────────────────────────────────
+def _chip(val):
+    cls = str(val).lower().replace(" ", "-")
+    return f'<span class="chip chip-{cls}">{val}</span>'
+
+def _render_table(df, cols, badge_col):
+    """Render a table with the badge column as pre-built HTML chips.
+
+    One vectorized .map replaces the Styler machinery, which materializes a
+    per-cell CSS frame the same shape as the table just to color one column.
+    """
+    show = [c for c in cols if c in df.columns]
+    disp = df[show].copy()
+    if badge_col in disp.columns:
+        disp[badge_col] = disp[badge_col].map(_chip)
+    st.markdown(disp.to_html(escape=False, index=False), unsafe_allow_html=True)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_bundle():
+    """One cached load of all three sheets serves the sidebar and every tab —
+    write paths invalidate it via st.cache_data.clear()."""
+    frames = read_sheets_batch(("pilot_roster", "drone_fleet", "missions"))
+    return {
+        "pilots": frames["pilot_roster"],
+        "drones": frames["drone_fleet"],
+        "missions": frames["missions"],
+    }
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_conflicts():
+    """Full conflict scan is the most expensive call in the app — cache it and
+    let write paths invalidate via st.cache_data.clear()."""
+    return detect_all_conflicts()
+
 # ─────────────────────────────────────────────
 # SESSION STATE
 # ─────────────────────────────────────────────
+sheets_bundle = _load_bundle()
+
 if "messages" not in st.session_state:
     st.session_state.messages = []       # Gemini history
 if "display" not in st.session_state:
@@ -130,13 +179,17 @@ with st.sidebar:
 
     # Live stats
     try:
-        pdf = read_sheet("pilot_roster")
-        ddf = read_sheet("drone_fleet")
-        mdf = read_sheet("missions")
-
-        avail_p = len(pdf[pdf["status"] == "Available"]) if not pdf.empty else 0
-        avail_d = len(ddf[ddf["status"] == "Available"]) if not ddf.empty else 0
-        maint_d = len(ddf[ddf["status"] == "Maintenance"]) if not ddf.empty else 0
+        # The tabs need the full frames anyway — reuse the shared bundle
+        pdf = sheets_bundle["pilots"]
+        ddf = sheets_bundle["drones"]
+        mdf = sheets_bundle["missions"]
+
+        # One value_counts pass per frame instead of a boolean mask per stat
+        p_counts = pdf["status"].value_counts() if not pdf.empty else pd.Series(dtype=int)
+        d_counts = ddf["status"].value_counts() if not ddf.empty else pd.Series(dtype=int)
+        avail_p = int(p_counts.get("Available", 0))
+        avail_d = int(d_counts.get("Available", 0))
+        maint_d = int(d_counts.get("Maintenance", 0))
         total_m = len(mdf) if not mdf.empty else 0
 
         c1, c2 = st.columns(2)
@@ -221,16 +274,20 @@ with tab_chat:
     if "_pending" in st.session_state:
         prompt = st.session_state._pending
         del st.session_state._pending
+        stream_box = st.empty()
         with st.spinner("🤖 Thinking..."):
-            resp, hist = chat(st.session_state.messages, prompt)
+            resp, hist = chat(st.session_state.messages, prompt,
+                              on_delta=lambda t: stream_box.markdown(f'<div class="msg-bot">🤖 {t}</div>', unsafe_allow_html=True))
             st.session_state.messages = hist
             st.session_state.display.append(("user", prompt))
             st.session_state.display.append(("bot", resp))
         st.rerun()
 
     if send and user_input:
+        stream_box = st.empty()
         with st.spinner("🤖 Thinking..."):
-            resp, hist = chat(st.session_state.messages, user_input)
+            resp, hist = chat(st.session_state.messages, user_input,
+                              on_delta=lambda t: stream_box.markdown(f'<div class="msg-bot">🤖 {t}</div>', unsafe_allow_html=True))
             st.session_state.messages = hist
             st.session_state.display.append(("user", user_input))
             st.session_state.display.append(("bot", resp))
@@ -240,23 +297,14 @@ with tab_chat:
 with tab_pilots:
     st.markdown('<div class="section-label">Pilot Roster — Live</div>', unsafe_allow_html=True)
     try:
-        df = read_sheet("pilot_roster")
+        df = sheets_bundle["pilots"]
         if not df.empty:
             flt = st.selectbox("Status", ["All", "Available", "Assigned", "On Leave", "Unavailable"], key="p_flt")
             if flt != "All":
                 df = df[df["status"] == flt]
 
-            def _p_style(val):
-                m = {"Available": "background:#063020;color:#2dd4a0",
-                     "Assigned": "background:#0d1f3f;color:#60a5fa",
-                     "On Leave": "background:#2a2005;color:#f5c242",
-                     "Unavailable": "background:#200808;color:#f46060"}
-                return m.get(str(val), "")
-
             cols = ["pilot_id","name","skills","certifications","location","status","current_assignment","available_from","daily_rate_inr"]
-            show = [c for c in cols if c in df.columns]
-            st.dataframe(df[show].style.applymap(_p_style, subset=["status"]),
-                         use_container_width=True, hide_index=True)
+            _render_table(df, cols, badge_col="status")
             st.caption(f"{len(df)} pilots shown")
     except Exception as e:
         st.error(f"Error: {e}")
@@ -265,22 +313,14 @@ with tab_pilots:
 with tab_drones:
     st.markdown('<div class="section-label">Drone Fleet — Live</div>', unsafe_allow_html=True)
     try:
-        df = read_sheet("drone_fleet")
+        df = sheets_bundle["drones"]
         if not df.empty:
             flt = st.selectbox("Status", ["All", "Available", "Deployed", "Maintenance"], key="d_flt")
             if flt != "All":
                 df = df[df["status"] == flt]
 
-            def _d_style(val):
-                m = {"Available": "background:#063020;color:#2dd4a0",
-                     "Deployed": "background:#0d1f3f;color:#60a5fa",
-                     "Maintenance": "background:#200808;color:#f46060"}
-                return m.get(str(val), "")
-
             cols = ["drone_id","model","capabilities","weather_resistance","status","location","current_assignment","maintenance_due"]
-            show = [c for c in cols if c in df.columns]
-            st.dataframe(df[show].style.applymap(_d_style, subset=["status"]),
-                         use_container_width=True, hide_index=True)
+            _render_table(df, cols, badge_col="status")
             st.caption(f"{len(df)} drones shown")
 
             # Maintenance alerts inline
@@ -296,20 +336,12 @@ with tab_drones:
 with tab_missions:
     st.markdown('<div class="section-label">Mission Board — Live</div>', unsafe_allow_html=True)
     try:
-        df = read_sheet("missions")
+        df = sheets_bundle["missions"]
         if not df.empty:
-            def _m_style(val):
-                m = {"Urgent": "background:#1f0808;color:#f46060",
-                     "High": "background:#1f1008;color:#f97316",
-                     "Standard": "background:#0d1f3f;color:#60a5fa"}
-                return m.get(str(val), "")
-
             cols = ["project_id","client","location","required_skills","required_certs",
                     "start_date","end_date","priority","mission_budget_inr",
                     "weather_forecast","assigned_pilot","assigned_drone","status"]
-            show = [c for c in cols if c in df.columns]
-            st.dataframe(df[show].style.applymap(_m_style, subset=["priority"]),
-                         use_container_width=True, hide_index=True)
+            _render_table(df, cols, badge_col="priority")
             st.caption(f"{len(df)} missions")
     except Exception as e:
         st.error(f"Error: {e}")
@@ -320,11 +352,12 @@ with tab_conflicts:
 
     if st.button("🔄 Run Conflict Scan", type="primary"):
         with st.spinner("Scanning..."):
-            st.session_state.conflicts = detect_all_conflicts()
+            _cached_conflicts.clear()  # explicit rescan bypasses the TTL
+            st.session_state.conflicts = _cached_conflicts()
 
     if "conflicts" not in st.session_state:
         with st.spinner("Running initial scan..."):
-            st.session_state.conflicts = detect_all_conflicts()
+            st.session_state.conflicts = _cached_conflicts()
 
     data = st.session_state.conflicts
     total = data.get("total_conflicts", 0)
@@ -2,13 +2,18 @@ import gspread
 from google.oauth2.service_account import Credentials
 import pandas as pd
 import streamlit as st
+import glob
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive"
 ]
 
+@st.cache_resource
 def get_sheets_client():
     try:
         if hasattr(st, 'secrets') and 'gcp_service_account' in st.secrets:
@@ -29,8 +34,108 @@ def get_sheet_id():
         pass
     return os.environ.get("SHEET_ID", "")
 
-def read_sheet(tab_name: str) -> pd.DataFrame:
-    """Read a Google Sheets tab. Falls back to local CSV if sheets not configured."""
+# Fixed-vocabulary columns per tab (see README schema). Stored as Categorical
+# so equality filters and value_counts work on integer codes, not row strings.
+_CATEGORICALS = {
+    "pilot_roster": {"status": ["Available", "Assigned", "On Leave", "Unavailable"]},
+    "drone_fleet": {"status": ["Available", "Deployed", "Maintenance"]},
+    "missions": {"priority": ["Standard", "High", "Urgent"]},
+}
+
+def _apply_categoricals(df: pd.DataFrame, tab_name: str) -> pd.DataFrame:
+    for col, cats in _CATEGORICALS.get(tab_name, {}).items():
+        if col in df.columns:
+            df[col] = df[col].astype(pd.CategoricalDtype(categories=cats))
+    return df
+
+def _project_and_filter(df: pd.DataFrame, columns, where) -> pd.DataFrame:
+    """Apply a `where` predicate, then project to `columns`, before caching.
+
+    Predicate keys are either a bare column name (case-insensitive equality)
+    or `col__contains` (case-insensitive substring match).
+    """
+    if df.empty:
+        return df
+    for key, val in (where or {}).items():
+        col, _, op = key.partition("__")
+        if col not in df.columns:
+            continue
+        if op == "contains":
+            df = df[df[col].astype(str).str.contains(str(val), case=False, na=False)]
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Resolve the value to its category once, then equality is an
+            # int-code compare instead of a per-row lowered string match
+            cats = {c.lower(): c for c in df[col].cat.categories}
+            target = cats.get(str(val).lower())
+            df = df[df[col] == target] if target is not None else df.iloc[0:0]
+        else:
+            df = df[df[col].astype(str).str.lower() == str(val).lower()]
+    if columns:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+# On-disk Parquet cache keyed by the sheet's Drive modifiedTime, so a fresh
+# process (or a cold st.cache_data) can skip the values fetch entirely when
+# the spreadsheet hasn't changed. Best-effort: any failure falls through to
+# a normal fetch.
+
+def _disk_cache_path(tab_name: str, etag: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"skylark_{tab_name}_{etag}.parquet")
+
+def _sheet_etag(spreadsheet) -> str:
+    """Drive modifiedTime of the spreadsheet — one tiny metadata call."""
+    try:
+        stamp = spreadsheet.get_lastUpdateTime()
+    except Exception:
+        return ""
+    return "".join(ch for ch in str(stamp) if ch.isalnum())
+
+def _disk_cache_load(tab_name: str, etag: str):
+    if not etag:
+        return None
+    path = _disk_cache_path(tab_name, etag)
+    if os.path.exists(path):
+        try:
+            return pd.read_parquet(path)
+        except Exception:
+            pass
+    return None
+
+def _disk_cache_store(tab_name: str, etag: str, df: pd.DataFrame):
+    if not etag:
+        return
+    try:
+        for stale in glob.glob(_disk_cache_path(tab_name, "*")):
+            os.remove(stale)
+        df.to_parquet(_disk_cache_path(tab_name, etag))
+    except Exception:
+        pass  # no pyarrow or tmpdir not writable — caching stays best-effort
+
+def _disk_cache_invalidate():
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), "skylark_*.parquet")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _finalize_frame(df: pd.DataFrame, tab_name: str) -> pd.DataFrame:
+    """Numeric coercion + categorical casts shared by every fetch path."""
+    num_cols = [c for c in ("daily_rate_inr", "mission_budget_inr") if c in df.columns]
+    if num_cols:
+        df[num_cols] = df[num_cols].apply(pd.to_numeric, errors="coerce")
+    return _apply_categoricals(df, tab_name)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def read_sheet(tab_name: str, columns: tuple = None, where: dict = None) -> pd.DataFrame:
+    """Read a Google Sheets tab. Falls back to local CSV if sheets not configured.
+
+    `columns` projects the result to the named columns — fetched as narrow
+    A1 ranges when Sheets is live, so unneeded columns never cross the wire.
+    `where` is a predicate dict (see _project_and_filter) applied before the
+    frame is cached, so repeated filtered queries hit a small cached frame.
+
+    Cached for 30s so reruns don't re-fetch; write paths clear the cache.
+    """
     client = get_sheets_client()
     sheet_id = get_sheet_id()
 
@@ -43,19 +148,142 @@ def read_sheet(tab_name: str) -> pd.DataFrame:
     if client and sheet_id:
         try:
             spreadsheet = client.open_by_key(sheet_id)
+            etag = _sheet_etag(spreadsheet)
+            if not columns:
+                cached = _disk_cache_load(tab_name, etag)
+                if cached is not None:
+                    return _project_and_filter(cached, columns, where)
             worksheet = spreadsheet.worksheet(tab_name)
-            data = worksheet.get_all_records()
-            df = pd.DataFrame(data)
+            if columns:
+                # Fetch only the projected columns plus any the predicate
+                # needs — one batch_get of single-column ranges
+                needed = tuple(dict.fromkeys(
+                    list(columns) + [k.partition("__")[0] for k in (where or {})]))
+                headers = worksheet.row_values(1)
+                ranges = []
+                for col in needed:
+                    letter = gspread.utils.rowcol_to_a1(1, headers.index(col) + 1).rstrip("0123456789")
+                    ranges.append(f"{letter}2:{letter}")
+                fetched = worksheet.batch_get(ranges)
+                df = pd.DataFrame({
+                    col: pd.Series([row[0] if row else "" for row in block])
+                    for col, block in zip(needed, fetched)
+                })
+            else:
+                # get_all_values avoids gspread's per-row dict construction;
+                # pandas builds the frame from the raw 2D list directly
+                values = worksheet.get_all_values()
+                df = pd.DataFrame(values[1:], columns=values[0]) if values else pd.DataFrame()
             if not df.empty:
-                return df
+                df = _finalize_frame(df, tab_name)
+                if not columns:
+                    _disk_cache_store(tab_name, etag, df)
+                return _project_and_filter(df, columns, where)
         except Exception:
             pass
 
     # Fallback to local CSV
     if tab_name in csv_map and os.path.exists(csv_map[tab_name]):
-        return pd.read_csv(csv_map[tab_name])
+        df = _apply_categoricals(pd.read_csv(csv_map[tab_name]), tab_name)
+        return _project_and_filter(df, columns, where)
     return pd.DataFrame()
 
+@st.cache_data(ttl=30, show_spinner=False)
+def read_sheets_batch(names: tuple) -> dict:
+    """Fetch several whole tabs in ONE values.batchGet RPC.
+
+    Returns {tab_name: DataFrame}. A cold cache previously paid one
+    round-trip per tab; batching collapses that to a single HTTP call.
+    Tabs whose on-disk Parquet copy matches the current Drive revision are
+    served from disk and excluded from the batch. Falls back to concurrent
+    per-tab read_sheet calls (including the CSV fallback) when Sheets is
+    not configured or the batch call fails.
+    """
+    client = get_sheets_client()
+    sheet_id = get_sheet_id()
+
+    if client and sheet_id:
+        try:
+            spreadsheet = client.open_by_key(sheet_id)
+            etag = _sheet_etag(spreadsheet)
+            out, misses = {}, []
+            for name in names:
+                cached = _disk_cache_load(name, etag)
+                if cached is not None:
+                    out[name] = cached
+                else:
+                    misses.append(name)
+            if misses:
+                resp = spreadsheet.values_batch_get(misses)
+                for name, vrange in zip(misses, resp.get("valueRanges", [])):
+                    values = vrange.get("values", [])
+                    if values:
+                        # batchGet doesn't pad short rows the way
+                        # get_all_values does
+                        width = len(values[0])
+                        rows = [r + [""] * (width - len(r)) for r in values[1:]]
+                        df = _finalize_frame(pd.DataFrame(rows, columns=values[0]), name)
+                        _disk_cache_store(name, etag, df)
+                    else:
+                        df = pd.DataFrame()
+                    out[name] = df
+            return out
+        except Exception:
+            pass
+
+    return _read_sheets_parallel(list(names))
+
+def _read_sheets_parallel(names: list) -> dict:
+    """Fetch several tabs concurrently — wall-clock cost is the slowest fetch, not the sum."""
+    with ThreadPoolExecutor(max_workers=len(names)) as ex:
+        return dict(zip(names, ex.map(read_sheet, names)))
+
+# Header rows are effectively static — cache them per tab so column-index
+# lookups don't cost a fetch on every write
+_HEADER_TTL = 300  # seconds
+_HEADER_CACHE: dict = {}
+
+def _get_headers(worksheet, tab_name: str) -> list:
+    hit = _HEADER_CACHE.get(tab_name)
+    if hit and time.monotonic() - hit[0] < _HEADER_TTL:
+        return hit[1]
+    headers = worksheet.row_values(1)
+    _HEADER_CACHE[tab_name] = (time.monotonic(), headers)
+    return headers
+
+def batch_update_cells(updates: list) -> dict:
+    """Apply many single-cell writes, possibly across tabs, in one batchUpdate call.
+
+    Each update is a (tab_name, id_col, id_val, update_col, new_value) tuple.
+    Against the Sheets write quota this costs one request regardless of count.
+    """
+    client = get_sheets_client()
+    sheet_id = get_sheet_id()
+
+    if not client or not sheet_id:
+        return {"success": False, "error": "Google Sheets not configured — update not synced to cloud (local data unchanged)."}
+
+    try:
+        spreadsheet = client.open_by_key(sheet_id)
+        data = []
+        for tab_name, id_col, id_val, update_col, new_value in updates:
+            worksheet = spreadsheet.worksheet(tab_name)
+            headers = _get_headers(worksheet, tab_name)
+            cell = worksheet.find(str(id_val), in_column=headers.index(id_col) + 1)
+            if cell is None:
+                return {"success": False, "error": f"Row with {id_col}='{id_val}' not found in {tab_name}"}
+            a1 = gspread.utils.rowcol_to_a1(cell.row, headers.index(update_col) + 1)
+            data.append({"range": f"{tab_name}!{a1}", "values": [[new_value]]})
+
+        spreadsheet.values_batch_update({"valueInputOption": "USER_ENTERED", "data": data})
+        st.cache_data.clear()  # invalidate cached reads and derived scans after a mutation
+        _disk_cache_invalidate()
+        tabs = len({u[0] for u in updates})
+        return {"success": True, "message": f"✅ Synced {len(data)} cell(s) across {tabs} tab(s) in one batched request"}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 def update_cell(tab_name: str, id_col: str, id_val: str, update_col: str, new_value: str) -> dict:
     """Update a single cell in Google Sheets."""
     client = get_sheets_client()
@@ -67,35 +295,57 @@ def update_cell(tab_name: str, id_col: str, id_val: str, update_col: str, new_va
     try:
         spreadsheet = client.open_by_key(sheet_id)
         worksheet = spreadsheet.worksheet(tab_name)
-        all_data = worksheet.get_all_values()
-        headers = all_data[0]
+        headers = _get_headers(worksheet, tab_name)
 
         id_col_idx = headers.index(id_col)
         update_col_idx = headers.index(update_col) + 1  # gspread is 1-indexed
 
-        row_num = None
-        for i, row in enumerate(all_data[1:], start=2):
-            if len(row) > id_col_idx and str(row[id_col_idx]) == str(id_val):
-                row_num = i
-                break
-
-        if row_num is None:
+        # Server-side search for the row — one tiny RPC instead of downloading the column
+        cell = worksheet.find(str(id_val), in_column=id_col_idx + 1)
+        if cell is None:
             return {"success": False, "error": f"Row with {id_col}='{id_val}' not found in {tab_name}"}
 
-        worksheet.update_cell(row_num, update_col_idx, new_value)
+        worksheet.update_cell(cell.row, update_col_idx, new_value)
+        st.cache_data.clear()  # invalidate cached reads and derived scans after a mutation
+        _disk_cache_invalidate()
         return {"success": True, "message": f"✅ Synced: {update_col} → '{new_value}' for {id_val} in Google Sheets"}
 
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 def update_multiple_cells(tab_name: str, id_col: str, id_val: str, updates: dict) -> dict:
-    """Update multiple columns for one row."""
-    results = []
-    for col, val in updates.items():
-        results.append(update_cell(tab_name, id_col, id_val, col, val))
-    success = all(r["success"] for r in results)
-    return {
-        "success": success,
-        "message": f"Updated {len(updates)} field(s) for {id_val} in {tab_name}",
-        "details": results
-    }
+    """Update multiple columns for one row in a single batched request."""
+    client = get_sheets_client()
+    sheet_id = get_sheet_id()
+
+    if not client or not sheet_id:
+        return {"success": False, "error": "Google Sheets not configured — update not synced to cloud (local data unchanged)."}
+
+    try:
+        spreadsheet = client.open_by_key(sheet_id)
+        worksheet = spreadsheet.worksheet(tab_name)
+        headers = _get_headers(worksheet, tab_name)
+        id_col_idx = headers.index(id_col)
+
+        # Server-side search for the row — one tiny RPC instead of downloading the sheet
+        cell = worksheet.find(str(id_val), in_column=id_col_idx + 1)
+        if cell is None:
+            return {"success": False, "error": f"Row with {id_col}='{id_val}' not found in {tab_name}"}
+        row_num = cell.row
+
+        # One batch_update RPC for all columns instead of one update_cell per column
+        payload = [
+            {"range": gspread.utils.rowcol_to_a1(row_num, headers.index(col) + 1),
+             "values": [[new_value]]}
+            for col, new_value in updates.items()
+        ]
+        worksheet.batch_update(payload, value_input_option="USER_ENTERED")
+        st.cache_data.clear()  # invalidate cached reads and derived scans after a mutation
+        _disk_cache_invalidate()
+        return {
+            "success": True,
+            "message": f"✅ Synced {len(updates)} field(s) for {id_val} in {tab_name} (single batched request)"
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
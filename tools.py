@@ -10,16 +10,23 @@ All 6 edge cases handled:
   6. Pilot and drone in different locations
 """
 
+import functools
+import heapq
+import re
+import sys
 import pandas as pd
 from datetime import datetime
-from sheets import read_sheet, update_cell, update_multiple_cells
+from sheets import read_sheet, read_sheets_batch, update_cell, update_multiple_cells, batch_update_cells
 
 
 # ────────────────────────────────────────────
 # HELPERS
 # ────────────────────────────────────────────
 
+@functools.lru_cache(maxsize=4096)
 def _parse_date(d):
+    # The distinct date strings in play are few (mission/availability dates),
+    # so repeat parses are cache hits instead of strptime attempts
     if not d or (isinstance(d, float) and pd.isna(d)):
         return None
     for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
@@ -29,30 +36,36 @@ def _parse_date(d):
             continue
     return None
 
-def _split(val, sep=";"):
-    """Split a semicolon-separated string into a clean set of lowercase strings."""
+# Both separators the sheets use, compiled once — one split handles
+# ";"- and ","-delimited lists alike
+_SEP_RE = re.compile(r"[;,]")
+
+def _split(val):
+    """Split a ;/,-separated string into a clean frozenset of lowercase strings."""
     if not val or (isinstance(val, float) and pd.isna(val)):
-        return set()
-    return {s.strip().lower() for s in str(val).split(sep) if s.strip()}
-
-def _skills_ok(required_str, pilot_str):
-    req = _split(required_str, ";") | _split(required_str, ",")
-    have = _split(pilot_str, ";") | _split(pilot_str, ",")
-    missing = req - have
-    return len(missing) == 0, missing
-
-def _certs_ok(required_str, pilot_str):
-    req = _split(required_str, ";") | _split(required_str, ",")
-    have = _split(pilot_str, ";") | _split(pilot_str, ",")
-    missing = req - have
-    return len(missing) == 0, missing
-
-def _dates_overlap(s1, e1, s2, e2):
-    d1s, d1e = _parse_date(s1), _parse_date(e1)
-    d2s, d2e = _parse_date(s2), _parse_date(e2)
-    if not all([d1s, d1e, d2s, d2e]):
-        return False
-    return d1s <= d2e and d2s <= d1e
+        return frozenset()
+    return frozenset(s.strip().lower() for s in _SEP_RE.split(str(val)) if s.strip())
+
+def _set_col(series):
+    """Column-wise _split: one vectorized pass building a frozenset per row."""
+    return (series.fillna("").astype(str).str.lower()
+            .str.split(_SEP_RE)
+            .map(lambda parts: frozenset(p.strip() for p in parts if p.strip())))
+
+def _parse_dates_col(series):
+    """Vectorized date parsing to pandas Timestamps (NaT on failure)."""
+    return pd.to_datetime(series, format="mixed", errors="coerce")
+
+def _norm_loc_col(series):
+    """Normalized, interned location strings. Locations are a small closed
+    vocabulary, so interning makes the many equality checks in the match and
+    conflict paths pointer compares rather than character scans."""
+    return series.fillna("").astype(str).str.strip().str.lower().map(sys.intern)
+
+def _index_rows(df, id_col):
+    """Hash-index a frame's rows by id: one O(N) pass replaces an O(N)
+    boolean-mask scan per lookup."""
+    return {str(row[id_col]).strip(): row for _, row in df.iterrows()}
 
 def _mission_duration_days(start, end):
     s, e = _parse_date(start), _parse_date(end)
@@ -60,19 +73,47 @@ def _mission_duration_days(start, end):
         return max((e - s).days + 1, 1)
     return 1
 
-def _drone_weather_ok(weather_resistance: str, weather_forecast: str) -> bool:
+def _find_double_bookings(missions) -> dict:
+    """Sweep-line per assigned pilot: map project_id -> overlapping mission rows.
+
+    Sorting each pilot's missions by start date and keeping a heap of open end
+    times finds every overlapping pair in O(M log M), instead of re-scanning
+    the missions frame once per mission.
+    """
+    overlaps = {}
+    assigned = missions[missions["assigned_pilot"].fillna("").astype(str).str.strip() != ""]
+    for _, group in assigned.groupby("assigned_pilot"):
+        if len(group) < 2:
+            continue
+        rows = [r for r in group.sort_values("_start_dt").to_dict(orient="records")
+                if pd.notna(r["_start_dt"]) and pd.notna(r["_end_dt"])]
+        open_heap = []  # (end_dt, seq, row) — seq breaks ties so rows never compare
+        for seq, row in enumerate(rows):
+            while open_heap and open_heap[0][0] < row["_start_dt"]:
+                heapq.heappop(open_heap)
+            for _, _, other in open_heap:
+                overlaps.setdefault(row["project_id"], []).append(other)
+                overlaps.setdefault(other["project_id"], []).append(row)
+            heapq.heappush(open_heap, (row["_end_dt"], seq, row))
+    return overlaps
+
+
+def _rain_ok_col(series):
+    """One vectorized pass over the weather_resistance column: True where
+    the drone's IP rating (IP43/IP44/IP55) permits rain flight."""
+    return series.fillna("").astype(str).str.lower().str.contains(r"ip4[34]|ip55", regex=True)
+
+
+def _drone_weather_ok(rain_ok, forecast: str) -> bool:
     """
     IP43 (Rain) drones can fly in any weather.
     None (Clear Sky Only) drones cannot fly in Rainy conditions.
     Cloudy/Sunny/Clear are fine for all drones.
+
+    `rain_ok` is the precomputed _rain_ok flag; `forecast` must already be
+    stripped/lowered — the check is then a single boolean.
     """
-    forecast = str(weather_forecast).strip().lower()
-    resistance = str(weather_resistance).strip().lower()
-    if forecast in ("sunny", "clear", "cloudy"):
-        return True
-    if forecast == "rainy":
-        return "ip43" in resistance or "ip44" in resistance or "ip55" in resistance
-    return True
+    return forecast != "rainy" or bool(rain_ok)
 
 
 # ────────────────────────────────────────────
@@ -80,50 +121,45 @@ def _drone_weather_ok(weather_resistance: str, weather_forecast: str) -> bool:
 # ────────────────────────────────────────────
 
 def query_pilots(skill: str = None, certification: str = None,
-                 location: str = None, status: str = None) -> dict:
-    """Search pilot roster by skill, certification, location, or status."""
-    df = read_sheet("pilot_roster")
-    if df.empty:
-        return {"error": "Could not load pilot roster"}
+                 location: str = None, status: str = None,
+                 limit: int = None) -> dict:
+    """Search pilot roster by skill, certification, location, or status.
 
-    res = df.copy()
+    `limit` caps how many rows are materialized as dicts; `count` always
+    reflects the full match total.
+    """
+    where = {}
     if skill:
-        res = res[res["skills"].str.contains(skill, case=False, na=False)]
+        where["skills__contains"] = skill
     if certification:
-        res = res[res["certifications"].str.contains(certification, case=False, na=False)]
+        where["certifications__contains"] = certification
     if location:
-        res = res[res["location"].str.contains(location, case=False, na=False)]
+        where["location__contains"] = location
     if status:
-        res = res[res["status"].str.lower() == status.lower()]
-
-    return {"count": len(res), "pilots": res.to_dict(orient="records")}
-
+        where["status"] = status
 
-def calculate_pilot_cost(pilot_id: str, mission_id: str) -> dict:
-    """Calculate total pilot cost for a mission and check against budget."""
-    pilots = read_sheet("pilot_roster")
-    missions = read_sheet("missions")
+    # Predicate pushdown: read_sheet filters before caching, so repeated
+    # queries with the same filters hit a small pre-filtered frame
+    res = read_sheet("pilot_roster", where=where or None)
+    if res.empty and not where:
+        return {"error": "Could not load pilot roster"}
 
-    p_row = pilots[pilots["pilot_id"] == pilot_id]
-    m_row = missions[missions["project_id"] == mission_id]
+    page = res.head(limit) if limit else res
+    return {"count": len(res), "page_size": len(page),
+            "pilots": page.to_dict(orient="records")}
 
-    if p_row.empty:
-        return {"error": f"Pilot {pilot_id} not found"}
-    if m_row.empty:
-        return {"error": f"Mission {mission_id} not found"}
-
-    pilot = p_row.iloc[0]
-    mission = m_row.iloc[0]
 
+def _calc_cost(pilot, mission) -> dict:
+    """Budget check on already-loaded rows — loop callers avoid re-reading sheets."""
     daily_rate = float(pilot["daily_rate_inr"])
     duration = _mission_duration_days(mission["start_date"], mission["end_date"])
     total_cost = daily_rate * duration
     budget = float(mission["mission_budget_inr"])
 
     return {
-        "pilot_id": pilot_id,
+        "pilot_id": pilot["pilot_id"],
         "pilot_name": pilot["name"],
-        "mission_id": mission_id,
+        "mission_id": mission["project_id"],
         "daily_rate_inr": daily_rate,
         "duration_days": duration,
         "total_cost_inr": total_cost,
@@ -135,20 +171,36 @@ def calculate_pilot_cost(pilot_id: str, mission_id: str) -> dict:
     }
 
 
+def calculate_pilot_cost(pilot_id: str, mission_id: str) -> dict:
+    """Calculate total pilot cost for a mission and check against budget."""
+    frames = read_sheets_batch(("pilot_roster", "missions"))
+    pilots, missions = frames["pilot_roster"], frames["missions"]
+
+    pilot = _index_rows(pilots, "pilot_id").get(str(pilot_id).strip())
+    mission = _index_rows(missions, "project_id").get(str(mission_id).strip())
+
+    if pilot is None:
+        return {"error": f"Pilot {pilot_id} not found"}
+    if mission is None:
+        return {"error": f"Mission {mission_id} not found"}
+
+    return _calc_cost(pilot, mission)
+
+
 def get_pilot_assignments() -> dict:
     """View all currently assigned pilots and their missions."""
-    pilots = read_sheet("pilot_roster")
-    missions = read_sheet("missions")
+    frames = read_sheets_batch(("pilot_roster", "missions"))
+    pilots, missions = frames["pilot_roster"], frames["missions"]
 
     assigned = pilots[pilots["status"] == "Assigned"]
+    missions_by_id = _index_rows(missions, "project_id")
     result = []
     for _, p in assigned.iterrows():
         mission_info = {}
         proj = str(p.get("current_assignment", "")).strip()
         if proj:
-            m = missions[missions["project_id"] == proj]
-            if not m.empty:
-                m = m.iloc[0]
+            m = missions_by_id.get(proj)
+            if m is not None:
                 mission_info = {
                     "client": m["client"],
                     "location": m["location"],
@@ -181,74 +233,118 @@ def match_pilots_to_mission(mission_id: str) -> dict:
     Flags: skill mismatch, cert mismatch, budget overrun, location mismatch,
            unavailability, and date conflicts.
     """
-    pilots = read_sheet("pilot_roster")
-    missions = read_sheet("missions")
-
-    m_row = missions[missions["project_id"] == mission_id]
-    if m_row.empty:
+    frames = read_sheets_batch(("pilot_roster", "missions"))
+    pilots, missions = frames["pilot_roster"], frames["missions"]
+
+    # Vectorized precompute: cert/skill sets and parsed dates once per frame,
+    # instead of re-splitting and re-parsing the same strings per pilot
+    pilots["_certs"] = _set_col(pilots["certifications"])
+    pilots["_skills"] = _set_col(pilots["skills"])
+    missions["_start_dt"] = _parse_dates_col(missions["start_date"])
+    missions["_end_dt"] = _parse_dates_col(missions["end_date"])
+
+    missions_by_id = _index_rows(missions, "project_id")
+    mission = missions_by_id.get(str(mission_id).strip())
+    if mission is None:
         return {"error": f"Mission {mission_id} not found"}
-    mission = m_row.iloc[0]
 
     # Pilots available on mission start date
-    mission_start = _parse_date(mission["start_date"])
-    mission_end = _parse_date(mission["end_date"])
+    mission_start = mission["_start_dt"]
+    req_certs = _split(mission["required_certs"])
+    req_skills = _split(mission["required_skills"])
 
     perfect, partial, ineligible = [], [], []
 
-    for _, pilot in pilots.iterrows():
+    # SoA: pull the columns into plain arrays once — label-based row access
+    # inside the loop costs ~µs per lookup, dwarfing the comparisons themselves
+    pilot_ids = pilots["pilot_id"].to_numpy()
+    names = pilots["name"].to_numpy()
+    statuses = pilots["status"].astype(str).to_numpy()
+    locations = pilots["location"].to_numpy()
+    skills_raw = pilots["skills"].to_numpy()
+    certs_raw = pilots["certifications"].to_numpy()
+    rates = pilots["daily_rate_inr"].to_numpy()
+    avail_raw = pilots["available_from"].to_numpy()
+    assignments = pilots["current_assignment"].to_numpy()
+    cert_sets = pilots["_certs"].to_numpy()
+    skill_sets = pilots["_skills"].to_numpy()
+    # Location comparison vectorized outside the loop, over interned strings
+    mission_loc = sys.intern(str(mission["location"]).strip().lower())
+    loc_matches = (_norm_loc_col(pilots["location"]) == mission_loc).to_numpy()
+
+    duration = _mission_duration_days(mission["start_date"], mission["end_date"])
+    budget = float(mission["mission_budget_inr"])
+    # Ineligible pilots never surface a cost in the UI, so skip the budget
+    # math for them; flip on if every row should carry a cost estimate
+    compute_cost_for_ineligible = False
+
+    for i in range(len(pilots)):
         issues = []
         warnings = []
 
+        # Checks run cheapest-first; once a hard blocker lands, the later
+        # (pricier) checks are skipped — the pilot is ineligible either way
+
         # Status check
-        if pilot["status"] == "On Leave":
+        if statuses[i] == "On Leave":
             issues.append("Pilot is on leave")
-        elif pilot["status"] == "Unavailable":
+        elif statuses[i] == "Unavailable":
             issues.append("Pilot is unavailable")
 
         # Availability date check
-        avail_from = _parse_date(pilot.get("available_from"))
-        if avail_from and mission_start and avail_from > mission_start:
-            issues.append(f"Not available until {pilot['available_from']} (mission starts {mission['start_date']})")
+        if not issues:
+            avail_from = _parse_date(avail_raw[i])
+            if avail_from and pd.notna(mission_start) and avail_from > mission_start:
+                issues.append(f"Not available until {avail_raw[i]} (mission starts {mission['start_date']})")
 
-        # EDGE CASE 1: Double-booking — check if already assigned to overlapping mission
-        if pilot["status"] == "Assigned" and str(pilot.get("current_assignment", "")).strip():
-            existing_proj = missions[missions["project_id"] == str(pilot["current_assignment"]).strip()]
-            if not existing_proj.empty:
-                ep = existing_proj.iloc[0]
-                if _dates_overlap(mission["start_date"], mission["end_date"], ep["start_date"], ep["end_date"]):
-                    issues.append(f"⚠️ DOUBLE-BOOKING: Already assigned to {pilot['current_assignment']} which overlaps these dates")
-
-        # EDGE CASE 2: Cert mismatch
-        certs_good, missing_certs = _certs_ok(mission["required_certs"], pilot["certifications"])
-        if not certs_good:
-            issues.append(f"⚠️ MISSING CERTIFICATIONS: {missing_certs}")
+        # Location mismatch (warning, not hard blocker)
+        loc_match = bool(loc_matches[i])
+        if not loc_match:
+            warnings.append(f"Pilot in {locations[i]}, mission in {mission['location']} — relocation needed")
 
-        # Skill mismatch
-        skills_good, missing_skills = _skills_ok(mission["required_skills"], pilot["skills"])
-        if not skills_good:
-            issues.append(f"Missing skills: {missing_skills}")
+        # EDGE CASE 2: Cert mismatch — frozenset difference on precomputed sets
+        if not issues:
+            missing_certs = req_certs - cert_sets[i]
+            if missing_certs:
+                issues.append(f"⚠️ MISSING CERTIFICATIONS: {set(missing_certs)}")
 
-        # EDGE CASE 3: Budget overrun
-        cost_info = calculate_pilot_cost(pilot["pilot_id"], mission_id)
-        if not cost_info.get("within_budget", True):
-            warnings.append(cost_info.get("budget_warning", "Budget warning"))
+        # Skill mismatch
+        if not issues:
+            missing_skills = req_skills - skill_sets[i]
+            if missing_skills:
+                issues.append(f"Missing skills: {set(missing_skills)}")
 
-        # Location mismatch (warning, not hard blocker)
-        loc_match = pilot["location"].strip().lower() == str(mission["location"]).strip().lower()
-        if not loc_match:
-            warnings.append(f"Pilot in {pilot['location']}, mission in {mission['location']} — relocation needed")
+        # EDGE CASE 1: Double-booking — check if already assigned to overlapping mission
+        if not issues and statuses[i] == "Assigned" and str(assignments[i]).strip():
+            ep = missions_by_id.get(str(assignments[i]).strip())
+            if ep is not None:
+                # NaT comparisons are False, so unparseable dates never flag
+                if mission["_start_dt"] <= ep["_end_dt"] and ep["_start_dt"] <= mission["_end_dt"]:
+                    issues.append(f"⚠️ DOUBLE-BOOKING: Already assigned to {assignments[i]} which overlaps these dates")
+
+        # EDGE CASE 3: Budget overrun — most expensive check, last
+        if not issues or compute_cost_for_ineligible:
+            total_cost = float(rates[i]) * duration
+            within_budget = total_cost <= budget
+            if not within_budget:
+                warnings.append(f"⚠️ Pilot cost ₹{total_cost} EXCEEDS mission budget ₹{budget} by ₹{total_cost - budget}")
+        else:
+            total_cost = "N/A"
+            within_budget = True
 
         entry = {
-            "pilot_id": pilot["pilot_id"],
-            "name": pilot["name"],
-            "status": pilot["status"],
-            "location": pilot["location"],
+            "pilot_id": pilot_ids[i],
+            "name": names[i],
+            "status": statuses[i],
+            "location": locations[i],
             "location_matches_mission": loc_match,
-            "skills": pilot["skills"],
-            "certifications": pilot["certifications"],
-            "daily_rate_inr": pilot["daily_rate_inr"],
-            "estimated_total_cost_inr": cost_info.get("total_cost_inr", "N/A"),
-            "within_budget": cost_info.get("within_budget", True),
+            "skills": skills_raw[i],
+            "certifications": certs_raw[i],
+            # np scalars fall into json.dumps' default=str and serialize as
+            # strings — cast back to a plain number
+            "daily_rate_inr": float(rates[i]),
+            "estimated_total_cost_inr": total_cost,
+            "within_budget": within_budget,
             "issues": issues,
             "warnings": warnings
         }
@@ -279,14 +375,18 @@ def match_drones_to_mission(mission_id: str) -> dict:
     Find drones suitable for a mission based on capabilities and weather.
     Flags: maintenance status, weather incompatibility, location mismatch.
     """
-    drones = read_sheet("drone_fleet")
-    missions = read_sheet("missions")
+    frames = read_sheets_batch(("drone_fleet", "missions"))
+    drones, missions = frames["drone_fleet"], frames["missions"]
 
-    m_row = missions[missions["project_id"] == mission_id]
-    if m_row.empty:
+    mission = _index_rows(missions, "project_id").get(str(mission_id).strip())
+    if mission is None:
         return {"error": f"Mission {mission_id} not found"}
-    mission = m_row.iloc[0]
     weather = str(mission["weather_forecast"]).strip()
+    forecast_norm = weather.lower()  # normalized once, not per drone
+    mission_loc = sys.intern(str(mission["location"]).strip().lower())
+    drones["_loc_norm"] = _norm_loc_col(drones["location"])
+    drones["_rain_ok"] = _rain_ok_col(drones["weather_resistance"])
+    req_skills = _split(mission["required_skills"])
 
     suitable, warnings_only, blocked = [], [], []
 
@@ -300,18 +400,17 @@ def match_drones_to_mission(mission_id: str) -> dict:
             issues.append(f"⚠️ DRONE IN MAINTENANCE — unavailable until {due}")
 
         # EDGE CASE 5: Weather incompatibility
-        weather_ok = _drone_weather_ok(drone["weather_resistance"], weather)
+        weather_ok = _drone_weather_ok(drone["_rain_ok"], forecast_norm)
         if not weather_ok:
             issues.append(f"⚠️ WEATHER MISMATCH: Drone rated '{drone['weather_resistance']}' cannot fly in '{weather}' conditions")
 
         # Location mismatch (warning)
-        loc_match = str(drone["location"]).strip().lower() == str(mission["location"]).strip().lower()
+        loc_match = drone["_loc_norm"] == mission_loc
         if not loc_match:
             warnings.append(f"Drone in {drone['location']}, mission in {mission['location']} — needs transport")
 
         # Capability check (informational)
-        req_skills = _split(mission["required_skills"], ";") | _split(mission["required_skills"], ",")
-        drone_caps = _split(drone["capabilities"], ";") | _split(drone["capabilities"], ",")
+        drone_caps = _split(drone["capabilities"])
         cap_overlap = req_skills & drone_caps
         cap_missing = req_skills - drone_caps
 
@@ -358,15 +457,17 @@ def assign_pilot_to_mission(pilot_id: str, mission_id: str) -> dict:
     if pilot_entry and pilot_entry.get("issues"):
         conflicts_found = pilot_entry["issues"]
 
-    # Update sheets regardless (coordinator may override), but flag conflicts
-    p_result = update_multiple_cells("pilot_roster", "pilot_id", pilot_id,
-                                      {"status": "Assigned", "current_assignment": mission_id})
-    m_result = update_cell("missions", "project_id", mission_id, "assigned_pilot", pilot_id)
+    # Update sheets regardless (coordinator may override), but flag conflicts.
+    # Pilot row and mission row go out in ONE batched write request.
+    result = batch_update_cells([
+        ("pilot_roster", "pilot_id", pilot_id, "status", "Assigned"),
+        ("pilot_roster", "pilot_id", pilot_id, "current_assignment", mission_id),
+        ("missions", "project_id", mission_id, "assigned_pilot", pilot_id),
+    ])
 
     return {
-        "success": p_result["success"] and m_result["success"],
-        "pilot_update": p_result,
-        "mission_update": m_result,
+        "success": result["success"],
+        "sync": result,
         "conflicts_detected": conflicts_found,
         "warning": "⚠️ Assignment made despite conflicts — please review!" if conflicts_found else None
     }
@@ -383,32 +484,40 @@ def assign_drone_to_mission(drone_id: str, mission_id: str) -> dict:
         conflicts_found = drone_entry["issues"]
 
     missions = read_sheet("missions")
-    m_row = missions[missions["project_id"] == mission_id]
-    mission_loc = m_row.iloc[0]["location"] if not m_row.empty else ""
+    m = _index_rows(missions, "project_id").get(str(mission_id).strip())
+    mission_loc = m["location"] if m is not None else ""
 
-    d_result = update_multiple_cells("drone_fleet", "drone_id", drone_id,
-                                      {"status": "Deployed", "current_assignment": mission_id,
-                                       "location": mission_loc})
-    m_result = update_cell("missions", "project_id", mission_id, "assigned_drone", drone_id)
+    # Drone row and mission row go out in ONE batched write request
+    result = batch_update_cells([
+        ("drone_fleet", "drone_id", drone_id, "status", "Deployed"),
+        ("drone_fleet", "drone_id", drone_id, "current_assignment", mission_id),
+        ("drone_fleet", "drone_id", drone_id, "location", mission_loc),
+        ("missions", "project_id", mission_id, "assigned_drone", drone_id),
+    ])
 
     return {
-        "success": d_result["success"] and m_result["success"],
-        "drone_update": d_result,
-        "mission_update": m_result,
+        "success": result["success"],
+        "sync": result,
         "conflicts_detected": conflicts_found,
         "warning": "⚠️ Assignment made despite conflicts — please review!" if conflicts_found else None
     }
 
 
-def get_active_assignments() -> dict:
+def get_active_assignments(limit: int = None) -> dict:
     """Get all missions that have been assigned pilots or drones."""
     missions = read_sheet("missions")
-    has_assignment = missions[
-        missions["assigned_pilot"].notna() & (missions["assigned_pilot"] != "") |
-        missions["assigned_drone"].notna() & (missions["assigned_drone"] != "")
-    ] if not missions.empty else missions
+    if missions.empty:
+        return {"count": 0, "missions": []}
+
+    # One sweep per column: fillna("").ne("") covers both the NaN and the
+    # empty-string case without evaluating each column twice
+    has_p = missions["assigned_pilot"].fillna("").ne("")
+    has_d = missions["assigned_drone"].fillna("").ne("")
+    active = missions.loc[has_p | has_d]
 
-    return {"count": len(has_assignment), "missions": has_assignment.to_dict(orient="records")}
+    page = active.head(limit) if limit else active
+    return {"count": len(active), "page_size": len(page),
+            "missions": page.to_dict(orient="records")}
 
 
 # ────────────────────────────────────────────
@@ -416,50 +525,55 @@ def get_active_assignments() -> dict:
 # ────────────────────────────────────────────
 
 def query_drones(capability: str = None, status: str = None,
-                 location: str = None, weather_resistance: str = None) -> dict:
-    """Search drone fleet by capability, status, location, or weather resistance."""
-    df = read_sheet("drone_fleet")
-    if df.empty:
-        return {"error": "Could not load drone fleet"}
+                 location: str = None, weather_resistance: str = None,
+                 limit: int = None) -> dict:
+    """Search drone fleet by capability, status, location, or weather resistance.
 
-    res = df.copy()
+    `limit` caps how many rows are materialized as dicts; `count` always
+    reflects the full match total.
+    """
+    where = {}
     if capability:
-        res = res[res["capabilities"].str.contains(capability, case=False, na=False)]
+        where["capabilities__contains"] = capability
     if status:
-        res = res[res["status"].str.lower() == status.lower()]
+        where["status"] = status
     if location:
-        res = res[res["location"].str.contains(location, case=False, na=False)]
+        where["location__contains"] = location
     if weather_resistance:
-        res = res[res["weather_resistance"].str.contains(weather_resistance, case=False, na=False)]
+        where["weather_resistance__contains"] = weather_resistance
 
-    return {"count": len(res), "drones": res.to_dict(orient="records")}
+    res = read_sheet("drone_fleet", where=where or None)
+    if res.empty and not where:
+        return {"error": "Could not load drone fleet"}
+
+    page = res.head(limit) if limit else res
+    return {"count": len(res), "page_size": len(page),
+            "drones": page.to_dict(orient="records")}
 
 
 def flag_maintenance_issues() -> dict:
     """Flag drones with overdue or upcoming maintenance (within 30 days)."""
     df = read_sheet("drone_fleet")
-    today = datetime.today()
-    overdue, upcoming = [], []
-
-    for _, drone in df.iterrows():
-        due = _parse_date(drone.get("maintenance_due"))
-        if not due:
-            continue
-        days = (due - today).days
-        entry = {
-            "drone_id": drone["drone_id"],
-            "model": drone["model"],
-            "location": drone["location"],
-            "status": drone["status"],
-            "maintenance_due": str(drone["maintenance_due"]),
-            "days_until_due": days
-        }
-        if days < 0:
-            entry["flag"] = f"🔴 OVERDUE by {abs(days)} days"
-            overdue.append(entry)
-        elif days <= 30:
-            entry["flag"] = f"🟡 Due in {days} days"
-            upcoming.append(entry)
+    if df.empty:
+        return {"overdue_count": 0, "upcoming_count": 0,
+                "overdue": [], "upcoming_within_30_days": []}
+
+    # Vectorized date math: one to_datetime pass and one subtraction replace
+    # the per-row _parse_date loop; NaT rows fail both masks, like the old
+    # skip-on-unparseable branch
+    due = _parse_dates_col(df["maintenance_due"])
+    days = (due - pd.Timestamp.today()).dt.days
+    cols = ["drone_id", "model", "location", "status", "maintenance_due"]
+
+    def _entries(mask, flag_fmt):
+        sub = df.loc[mask, cols].copy()
+        sub["maintenance_due"] = sub["maintenance_due"].astype(str)
+        sub["days_until_due"] = days[mask].astype(int)
+        sub["flag"] = [flag_fmt(d) for d in sub["days_until_due"]]
+        return sub.to_dict(orient="records")
+
+    overdue = _entries(days < 0, lambda d: f"🔴 OVERDUE by {abs(d)} days")
+    upcoming = _entries((days >= 0) & (days <= 30), lambda d: f"🟡 Due in {d} days")
 
     return {
         "overdue_count": len(overdue),
@@ -488,6 +602,250 @@ def update_drone_status(drone_id: str, new_status: str, location: str = None) ->
 # 4. CONFLICT DETECTION (all 6 edge cases)
 # ────────────────────────────────────────────
 
+def _ensure_cols(df, cols):
+    """Add any of `cols` missing from the frame (as empty columns). An empty
+    tab loads as a columnless frame, which would otherwise KeyError the first
+    column access."""
+    missing = [c for c in cols if c not in df.columns]
+    return df.reindex(columns=[*df.columns, *missing]) if missing else df
+
+
+def _prepared_conflict_frames():
+    """Load the three sheets and attach the derived columns the conflict
+    checks rely on (parsed dates, cert/skill frozensets)."""
+    frames = read_sheets_batch(("pilot_roster", "drone_fleet", "missions"))
+    pilots, drones, missions = (frames["pilot_roster"], frames["drone_fleet"],
+                                frames["missions"])
+
+    # Guard against empty/columnless loads (empty live tab, missing CSV) so
+    # the derived columns and merge keys below stay defined and the scan
+    # degrades to zero conflicts instead of raising
+    pilots = _ensure_cols(pilots, (
+        "pilot_id", "name", "location", "certifications", "skills",
+        "daily_rate_inr"))
+    drones = _ensure_cols(drones, (
+        "drone_id", "model", "location", "status", "weather_resistance",
+        "maintenance_due"))
+    missions = _ensure_cols(missions, (
+        "project_id", "start_date", "end_date", "required_certs",
+        "required_skills", "location", "assigned_pilot", "assigned_drone",
+        "mission_budget_inr", "weather_forecast"))
+
+    # Parse all mission dates once, vectorized — the overlap checks below
+    # compare Timestamps instead of re-parsing strings per pair
+    missions["_start_dt"] = _parse_dates_col(missions["start_date"])
+    missions["_end_dt"] = _parse_dates_col(missions["end_date"])
+
+    # Build every cert/skill set once per run — the nested checks below do
+    # frozenset differences instead of re-splitting strings per mission x pilot
+    pilots["_certs"] = _set_col(pilots["certifications"])
+    pilots["_skills"] = _set_col(pilots["skills"])
+    missions["_req_certs"] = _set_col(missions["required_certs"])
+    missions["_req_skills"] = _set_col(missions["required_skills"])
+
+    # Interned lowercase locations — every location equality downstream is a
+    # pointer compare
+    pilots["_loc_norm"] = _norm_loc_col(pilots["location"])
+    drones["_loc_norm"] = _norm_loc_col(drones["location"])
+    missions["_loc_norm"] = _norm_loc_col(missions["location"])
+
+    # Rain-capability flag once per fleet — the weather check is then boolean
+    drones["_rain_ok"] = _rain_ok_col(drones["weather_resistance"])
+
+    return pilots, drones, missions
+
+
+def _merged_conflict_frame():
+    """Left-join pilot and drone rows onto missions and precompute every
+    conflict mask vectorized.
+
+    One merge per sheet replaces the per-mission pilot/drone lookups, and
+    each conflict family becomes a single column comparison over the wide
+    frame; the emitters below only format messages for rows whose mask is
+    already True.
+    """
+    pilots, drones, missions = _prepared_conflict_frames()
+
+    merged = missions.copy()
+    # str() of NaN yields "nan", matching the per-row str(...) the scan always
+    # applied — such rows surface as *_NOT_FOUND rather than being skipped
+    merged["_ap"] = merged["assigned_pilot"].astype(str).str.strip()
+    merged["_ad"] = merged["assigned_drone"].astype(str).str.strip()
+
+    p = pilots.add_prefix("p_")
+    p["_pid"] = p["p_pilot_id"].astype(str).str.strip()
+    d = drones.add_prefix("d_")
+    d["_did"] = d["d_drone_id"].astype(str).str.strip()
+
+    merged = merged.merge(p, left_on="_ap", right_on="_pid", how="left")
+    merged = merged.merge(d, left_on="_ad", right_on="_did", how="left")
+
+    has_p = merged["_ap"] != ""
+    has_d = merged["_ad"] != ""
+    p_found = merged["p_pilot_id"].notna()
+    d_found = merged["d_drone_id"].notna()
+    # Precomputed interned _loc_norm columns: the mismatch masks compare
+    # pointers, not characters
+    mission_loc = merged["_loc_norm"]
+    p_loc = merged["p__loc_norm"].fillna("")
+    d_loc = merged["d__loc_norm"].fillna("")
+
+    merged["_p_missing"] = has_p & ~p_found
+    merged["_d_missing"] = has_d & ~d_found
+    merged["_p_loc_mismatch"] = has_p & p_found & (p_loc != mission_loc)
+    merged["_d_loc_mismatch"] = has_d & d_found & (d_loc != mission_loc)
+    merged["_pd_loc_mismatch"] = has_p & has_d & p_found & d_found & (p_loc != d_loc)
+    merged["_d_in_maint"] = has_d & d_found & (merged["d_status"].astype(str).str.strip() == "Maintenance")
+
+    # Budget: same arithmetic as _calc_cost, done once for the whole column
+    duration = ((merged["_end_dt"] - merged["_start_dt"]).dt.days + 1).clip(lower=1).fillna(1)
+    merged["_p_total_cost"] = merged["p_daily_rate_inr"] * duration
+    merged["_over_budget"] = has_p & p_found & (merged["_p_total_cost"] > merged["mission_budget_inr"])
+
+    # Set diffs stay per-row (frozensets), but over plain arrays, not lookups
+    merged["_missing_certs"] = [
+        rc - pc if isinstance(pc, frozenset) else frozenset()
+        for rc, pc in zip(merged["_req_certs"], merged["p__certs"])
+    ]
+    merged["_missing_skills"] = [
+        rs - ps if isinstance(ps, frozenset) else frozenset()
+        for rs, ps in zip(merged["_req_skills"], merged["p__skills"])
+    ]
+    # Weather: forecast normalized once per column, rain capability is the
+    # precomputed _rain_ok flag — the whole check is three boolean columns
+    forecast_norm = merged["weather_forecast"].fillna("").astype(str).str.strip().str.lower()
+    merged["_d_weather_bad"] = (has_d & d_found & (forecast_norm == "rainy")
+                                & ~merged["d__rain_ok"].fillna(False).astype(bool))
+
+    return merged, missions
+
+
+def _conflicts_for_merged_row(row, booking_overlaps) -> list:
+    """Format conflict dicts for one merged mission row; the boolean
+    decisions were already made vectorized in _merged_conflict_frame."""
+    conflicts = []
+    mid = row["project_id"]
+    assigned_pilot = row["_ap"]
+    assigned_drone = row["_ad"]
+    weather = str(row.get("weather_forecast", "Sunny")).strip()
+
+    # ── PILOT CHECKS ──
+    if assigned_pilot and row["_p_missing"]:
+        conflicts.append({
+            "type": "PILOT_NOT_FOUND",
+            "severity": "Critical",
+            "mission": mid,
+            "detail": f"Assigned pilot '{assigned_pilot}' does not exist in roster"
+        })
+    elif assigned_pilot:
+        # EDGE CASE 2: Cert mismatch — diff on precomputed frozensets
+        if row["_missing_certs"]:
+            conflicts.append({
+                "type": "CERT_MISMATCH",
+                "severity": "Critical",
+                "mission": mid,
+                "pilot": assigned_pilot,
+                "detail": f"Pilot '{row['p_name']}' lacks required certifications: {set(row['_missing_certs'])}"
+            })
+
+        # Skill mismatch
+        if row["_missing_skills"]:
+            conflicts.append({
+                "type": "SKILL_MISMATCH",
+                "severity": "High",
+                "mission": mid,
+                "pilot": assigned_pilot,
+                "detail": f"Pilot '{row['p_name']}' lacks required skills: {set(row['_missing_skills'])}"
+            })
+
+        # EDGE CASE 3: Budget overrun
+        if row["_over_budget"]:
+            total_cost = float(row["_p_total_cost"])
+            budget = float(row["mission_budget_inr"])
+            conflicts.append({
+                "type": "BUDGET_OVERRUN",
+                "severity": "High",
+                "mission": mid,
+                "pilot": assigned_pilot,
+                "detail": f"⚠️ Pilot cost ₹{total_cost} EXCEEDS mission budget ₹{budget} by ₹{total_cost - budget}"
+            })
+
+        # EDGE CASE 1: Double-booking — pilot in overlapping mission
+        for other in booking_overlaps.get(mid, []):
+            conflicts.append({
+                "type": "PILOT_DOUBLE_BOOKING",
+                "severity": "Critical",
+                "mission": mid,
+                "pilot": assigned_pilot,
+                "detail": f"Pilot '{row['p_name']}' already assigned to {other['project_id']} "
+                          f"({other['start_date']} → {other['end_date']}) — dates overlap!"
+            })
+
+        # EDGE CASE 6 (partial): Pilot-mission location mismatch
+        if row["_p_loc_mismatch"]:
+            conflicts.append({
+                "type": "PILOT_LOCATION_MISMATCH",
+                "severity": "Medium",
+                "mission": mid,
+                "pilot": assigned_pilot,
+                "detail": f"Pilot '{row['p_name']}' is in {row['p_location']} but mission is in {row['location']}"
+            })
+
+    # ── DRONE CHECKS ──
+    if assigned_drone and row["_d_missing"]:
+        conflicts.append({
+            "type": "DRONE_NOT_FOUND",
+            "severity": "Critical",
+            "mission": mid,
+            "detail": f"Assigned drone '{assigned_drone}' does not exist in fleet"
+        })
+    elif assigned_drone:
+        # EDGE CASE 4: Drone in maintenance
+        if row["_d_in_maint"]:
+            conflicts.append({
+                "type": "DRONE_IN_MAINTENANCE",
+                "severity": "Critical",
+                "mission": mid,
+                "drone": assigned_drone,
+                "detail": f"Drone '{row['d_model']}' ({assigned_drone}) is in maintenance until {row.get('d_maintenance_due', '?')}"
+            })
+
+        # EDGE CASE 5: Weather mismatch
+        if row["_d_weather_bad"]:
+            conflicts.append({
+                "type": "WEATHER_RISK",
+                "severity": "Critical",
+                "mission": mid,
+                "drone": assigned_drone,
+                "detail": f"Drone '{row['d_model']}' rated '{row['d_weather_resistance']}' "
+                          f"cannot fly in '{weather}' forecast for {mid}"
+            })
+
+        # EDGE CASE 6 (partial): Drone-mission location mismatch
+        if row["_d_loc_mismatch"]:
+            conflicts.append({
+                "type": "DRONE_LOCATION_MISMATCH",
+                "severity": "Medium",
+                "mission": mid,
+                "drone": assigned_drone,
+                "detail": f"Drone is in {row['d_location']} but mission is in {row['location']}"
+            })
+
+    # ── EDGE CASE 6 (combined): Pilot and drone in DIFFERENT locations from each other ──
+    if row["_pd_loc_mismatch"]:
+        conflicts.append({
+            "type": "PILOT_DRONE_LOCATION_MISMATCH",
+            "severity": "High",
+            "mission": mid,
+            "pilot": assigned_pilot,
+            "drone": assigned_drone,
+            "detail": f"Pilot ({row['p_location']}) and Drone ({row['d_location']}) "
+                      f"are in different locations — cannot operate together"
+        })
+
+    return conflicts
+
+
 def detect_all_conflicts() -> dict:
     """
     Full conflict scan across all missions.
@@ -499,168 +857,42 @@ def detect_all_conflicts() -> dict:
       5. Drone not weather-rated
       6. Pilot and drone in different location
     """
-    pilots = read_sheet("pilot_roster")
-    drones = read_sheet("drone_fleet")
-    missions = read_sheet("missions")
+    merged, missions = _merged_conflict_frame()
 
-    conflicts = []
+    # EDGE CASE 1 precompute: all overlapping same-pilot mission pairs in one sweep
+    booking_overlaps = _find_double_bookings(missions)
+
+    # Bucket by severity as conflicts are emitted: concatenating the buckets
+    # replaces the end-of-scan sort, and the counts come free — no extra
+    # passes over the list
+    buckets = {"Critical": [], "High": [], "Medium": []}
+    other = []
+    for row in merged.to_dict(orient="records"):
+        for c in _conflicts_for_merged_row(row, booking_overlaps):
+            buckets.get(c["severity"], other).append(c)
 
-    for _, mission in missions.iterrows():
-        mid = mission["project_id"]
-        assigned_pilot = str(mission.get("assigned_pilot", "")).strip()
-        assigned_drone = str(mission.get("assigned_drone", "")).strip()
-        weather = str(mission.get("weather_forecast", "Sunny")).strip()
-
-        # ── PILOT CHECKS ──
-        if assigned_pilot:
-            p_rows = pilots[pilots["pilot_id"] == assigned_pilot]
-            if p_rows.empty:
-                conflicts.append({
-                    "type": "PILOT_NOT_FOUND",
-                    "severity": "Critical",
-                    "mission": mid,
-                    "detail": f"Assigned pilot '{assigned_pilot}' does not exist in roster"
-                })
-            else:
-                pilot = p_rows.iloc[0]
-
-                # EDGE CASE 2: Cert mismatch
-                certs_good, missing_certs = _certs_ok(mission["required_certs"], pilot["certifications"])
-                if not certs_good:
-                    conflicts.append({
-                        "type": "CERT_MISMATCH",
-                        "severity": "Critical",
-                        "mission": mid,
-                        "pilot": assigned_pilot,
-                        "detail": f"Pilot '{pilot['name']}' lacks required certifications: {missing_certs}"
-                    })
-
-                # Skill mismatch
-                skills_good, missing_skills = _skills_ok(mission["required_skills"], pilot["skills"])
-                if not skills_good:
-                    conflicts.append({
-                        "type": "SKILL_MISMATCH",
-                        "severity": "High",
-                        "mission": mid,
-                        "pilot": assigned_pilot,
-                        "detail": f"Pilot '{pilot['name']}' lacks required skills: {missing_skills}"
-                    })
-
-                # EDGE CASE 3: Budget overrun
-                cost = calculate_pilot_cost(assigned_pilot, mid)
-                if not cost.get("within_budget", True):
-                    conflicts.append({
-                        "type": "BUDGET_OVERRUN",
-                        "severity": "High",
-                        "mission": mid,
-                        "pilot": assigned_pilot,
-                        "detail": cost.get("budget_warning", "Budget exceeded")
-                    })
-
-                # EDGE CASE 1: Double-booking — pilot in overlapping mission
-                other_missions = missions[
-                    (missions["assigned_pilot"] == assigned_pilot) &
-                    (missions["project_id"] != mid)
-                ]
-                for _, other in other_missions.iterrows():
-                    if _dates_overlap(mission["start_date"], mission["end_date"],
-                                      other["start_date"], other["end_date"]):
-                        conflicts.append({
-                            "type": "PILOT_DOUBLE_BOOKING",
-                            "severity": "Critical",
-                            "mission": mid,
-                            "pilot": assigned_pilot,
-                            "detail": f"Pilot '{pilot['name']}' already assigned to {other['project_id']} "
-                                      f"({other['start_date']} → {other['end_date']}) — dates overlap!"
-                        })
-
-                # EDGE CASE 6 (partial): Pilot-mission location mismatch
-                if str(pilot["location"]).strip().lower() != str(mission["location"]).strip().lower():
-                    conflicts.append({
-                        "type": "PILOT_LOCATION_MISMATCH",
-                        "severity": "Medium",
-                        "mission": mid,
-                        "pilot": assigned_pilot,
-                        "detail": f"Pilot '{pilot['name']}' is in {pilot['location']} but mission is in {mission['location']}"
-                    })
-
-        # ── DRONE CHECKS ──
-        if assigned_drone:
-            d_rows = drones[drones["drone_id"] == assigned_drone]
-            if d_rows.empty:
-                conflicts.append({
-                    "type": "DRONE_NOT_FOUND",
-                    "severity": "Critical",
-                    "mission": mid,
-                    "detail": f"Assigned drone '{assigned_drone}' does not exist in fleet"
-                })
-            else:
-                drone = d_rows.iloc[0]
-
-                # EDGE CASE 4: Drone in maintenance
-                if str(drone["status"]).strip() == "Maintenance":
-                    conflicts.append({
-                        "type": "DRONE_IN_MAINTENANCE",
-                        "severity": "Critical",
-                        "mission": mid,
-                        "drone": assigned_drone,
-                        "detail": f"Drone '{drone['model']}' ({assigned_drone}) is in maintenance until {drone.get('maintenance_due', '?')}"
-                    })
-
-                # EDGE CASE 5: Weather mismatch
-                if not _drone_weather_ok(drone["weather_resistance"], weather):
-                    conflicts.append({
-                        "type": "WEATHER_RISK",
-                        "severity": "Critical",
-                        "mission": mid,
-                        "drone": assigned_drone,
-                        "detail": f"Drone '{drone['model']}' rated '{drone['weather_resistance']}' "
-                                  f"cannot fly in '{weather}' forecast for {mid}"
-                    })
-
-                # EDGE CASE 6 (partial): Drone-mission location mismatch
-                if str(drone["location"]).strip().lower() != str(mission["location"]).strip().lower():
-                    conflicts.append({
-                        "type": "DRONE_LOCATION_MISMATCH",
-                        "severity": "Medium",
-                        "mission": mid,
-                        "drone": assigned_drone,
-                        "detail": f"Drone is in {drone['location']} but mission is in {mission['location']}"
-                    })
-
-        # ── EDGE CASE 6 (combined): Pilot and drone in DIFFERENT locations from each other ──
-        if assigned_pilot and assigned_drone:
-            p_rows = pilots[pilots["pilot_id"] == assigned_pilot]
-            d_rows = drones[drones["drone_id"] == assigned_drone]
-            if not p_rows.empty and not d_rows.empty:
-                pilot_loc = str(p_rows.iloc[0]["location"]).strip().lower()
-                drone_loc = str(d_rows.iloc[0]["location"]).strip().lower()
-                if pilot_loc != drone_loc:
-                    conflicts.append({
-                        "type": "PILOT_DRONE_LOCATION_MISMATCH",
-                        "severity": "High",
-                        "mission": mid,
-                        "pilot": assigned_pilot,
-                        "drone": assigned_drone,
-                        "detail": f"Pilot ({p_rows.iloc[0]['location']}) and Drone ({d_rows.iloc[0]['location']}) "
-                                  f"are in different locations — cannot operate together"
-                    })
-
-    # Sort by severity
-    order = {"Critical": 0, "High": 1, "Medium": 2}
-    conflicts.sort(key=lambda x: order.get(x["severity"], 9))
+    conflicts = buckets["Critical"] + buckets["High"] + buckets["Medium"] + other
 
     return {
         "total_conflicts": len(conflicts),
-        "critical": sum(1 for c in conflicts if c["severity"] == "Critical"),
-        "high": sum(1 for c in conflicts if c["severity"] == "High"),
-        "medium": sum(1 for c in conflicts if c["severity"] == "Medium"),
+        "critical": len(buckets["Critical"]),
+        "high": len(buckets["High"]),
+        "medium": len(buckets["Medium"]),
         "conflicts": conflicts
     }
 
 
 def check_mission_conflicts(mission_id: str) -> dict:
-    """Check conflicts for one specific mission."""
-    all_c = detect_all_conflicts()
-    mine = [c for c in all_c["conflicts"] if c.get("mission") == mission_id]
+    """Check conflicts for one specific mission — no full-fleet scan needed."""
+    merged, missions = _merged_conflict_frame()
+
+    row = _index_rows(merged, "project_id").get(str(mission_id).strip())
+    if row is None:
+        return {"mission_id": mission_id, "conflict_count": 0, "conflicts": []}
+
+    mine = _conflicts_for_merged_row(row, _find_double_bookings(missions))
+    # Same Critical → High → Medium ordering detect_all_conflicts gives;
+    # stable sort keeps emission order within a severity
+    rank = {"Critical": 0, "High": 1, "Medium": 2}
+    mine.sort(key=lambda c: rank.get(c["severity"], 3))
     return {"mission_id": mission_id, "conflict_count": len(mine), "conflicts": mine}